@@ -19,10 +19,16 @@ import math
 import os
 from pathlib import Path
 import re
-import shutil
+import shlex
 import subprocess
 
 
+_RAD_RE = re.compile(r'RAD[RGB]')
+_SHELL_META_RE = re.compile(r'[|&;<>()$`\\"\'*?~%^]') # Characters that need a shell to be interpreted
+
+_ALTAZ_KERNEL = None # Numba kernel of altaz_batch, compiled on first use
+
+
 
 def check_templates(folderpath):
     """
@@ -34,16 +40,16 @@ def check_templates(folderpath):
     Returns:
         None
     """
-    sun_template = folderpath / "001-sun_template.rad"
-    vf_template = folderpath / "x.vf"
-    NNN_sun_template = folderpath / "NNN-sun_template.rad"
-    manysun_template = folderpath / "manysun.fmt"
-    missing_files = []
+    template_names = ["001-sun_template.rad", "x.vf", "NNN-sun_template.rad", "manysun.fmt"]
     
     print(f"Looking for template files in {folderpath}")
-    for file in [sun_template, vf_template, NNN_sun_template, manysun_template]:
-        if not os.path.exists(file):
-            missing_files.append(file)
+    # A single directory scan replaces a separate existence check per template
+    present_files = set()
+    if folderpath.is_dir():
+        with os.scandir(folderpath) as entries:
+            # normcase keeps the comparison case-insensitive on Windows, like os.path.exists
+            present_files = {os.path.normcase(entry.name) for entry in entries if entry.is_file()}
+    missing_files = [folderpath / name for name in template_names if os.path.normcase(name) not in present_files]
 
     if missing_files:
         raise FileNotFoundError("The following templates are missing:", missing_files)
@@ -70,16 +76,23 @@ def execute_gendaylit_gensky(sun_description):
         
 
     for i, line in enumerate(lines):
-        if '!gendaylit' in line or '!gensky' in line:
+        if '!g' not in line:
+            continue
+        if line.lstrip().startswith(('!gendaylit', '!gensky')):
             modified_line = line.replace('!', '')
-            results = subprocess.check_output(modified_line, shell=True).decode('UTF-8').replace('\n', '')
+            # Like in RADIANCE, a command with pipes, redirections, quotes or (Windows) backslashes is left to the shell
+            if _SHELL_META_RE.search(modified_line):
+                results = subprocess.run(modified_line, shell=True, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+            else:
+                results = subprocess.run(shlex.split(modified_line), stdout=subprocess.PIPE, universal_newlines=True, check=True)
 
-            lines[i] = results.strip()
+            lines[i] = results.stdout
             print('Executed Gendaylit or Gensky to prepare sun description for conversion')
-            break
 
-    with open(sun_description, 'w') as file:
-        file.writelines(lines)
+            # Only rewrite the file when a generator has been executed
+            with open(sun_description, 'w') as file:
+                file.writelines(lines)
+            break
 
 
 
@@ -95,21 +108,24 @@ def check_sun_description(sun_description):
     Returns:
         Changes are made to the supplied sun description file.
     """
-    pattern1 = r'\bvoid\s+\s*light\s+\s*solar\b'
-    pattern2 = r'\bsolar\s+\s*source\s+\s*sun\b'
     has_void_light_solar = False
     has_solar_source_sun = False
     modified_lines = []
 
     with open(sun_description, 'r') as file:
         for line in file:
-            if re.search(pattern1, line):
+            # Collapse whitespace once, so the definitions can be found with a plain substring test.
+            # The padding spaces make the test match whole words only, like the former \b regex.
+            normalized_line = ' '.join(line.split())
+            padded_line = f" {normalized_line} "
+
+            if ' void light solar ' in padded_line:
                 has_void_light_solar = True
-                line = re.sub(r'\s+', ' ', line)
+                line = normalized_line
 
-            if re.search(pattern2, line):
+            if ' solar source sun ' in padded_line:
                 has_solar_source_sun = True
-                line = re.sub(r'\s+', ' ', line)
+                line = normalized_line
 
             modified_lines.append(line.strip())
 
@@ -128,6 +144,87 @@ def check_sun_description(sun_description):
 
 
 
+def _altaz(x, y, z):
+    # Shared by xyz_to_altaz and altaz_batch; the azimuth is measured from the negative Y-axis (0,-1,0).
+    # atan2 resolves the quadrant directly and stays well defined near the zenith
+    altitude = math.degrees(math.asin(z))
+    azimuth = (math.degrees(math.atan2(-x, -y)) + 360.0) % 360.0
+    return altitude, azimuth
+
+
+
+def xyz_to_altaz(x, y, z):
+    """
+    Converts a sun direction vector to a solar altitude and azimuth. The 
+    azimuth is measured from the negative Y-axis (0,-1,0).
+    
+    Args:
+        x (float): The X component of the (unit) sun direction vector
+        y (float): The Y component of the (unit) sun direction vector
+        z (float): The Z component of the (unit) sun direction vector
+    Returns:
+        altitude (float): The solar altitude in degrees
+        azimuth (float): The solar azimuth in degrees
+    """
+    if abs(z) > 1:
+        raise ValueError(f"The Z component of the sun direction vector ({z}) is outside [-1, 1]. Is the vector normalised?")
+    return _altaz(x, y, z)
+
+
+
+def _compile_altaz_kernel():
+    """
+    Compiles the parallel Numba kernel used by altaz_batch. Numba is only 
+    imported here, so the command line tool does not pay for it.
+    """
+    from numba import njit, prange
+
+    altaz_jit = njit(cache=True)(_altaz)
+
+    @njit(parallel=True, cache=True)
+    def altaz_kernel(xyz, altaz):
+        for i in prange(xyz.shape[0]):
+            altitude, azimuth = altaz_jit(xyz[i, 0], xyz[i, 1], xyz[i, 2])
+            altaz[i, 0] = altitude
+            altaz[i, 1] = azimuth
+
+    return altaz_kernel
+
+
+
+def altaz_batch(sunvec):
+    """
+    Calculates the solar altitude and azimuth of every mini sun in a list of 
+    sun vectors, with the same convention as xyz_to_altaz. Intended for 
+    post-processing of the generated mini suns; it is not used by the command 
+    line tool. Requires NumPy, and runs as a parallel kernel when Numba is 
+    available.
+    
+    Args:
+        sunvec (path): The path to a list of sun vectors (NNN-sun.vec)
+    Returns:
+        altaz (ndarray): An array with the altitude and azimuth (in degrees) of 
+        each mini sun
+    """
+    global _ALTAZ_KERNEL
+    import numpy as np
+
+    xyz = np.loadtxt(sunvec, ndmin=2)
+    if np.any(np.abs(xyz[:, 2]) > 1):
+        raise ValueError(f"{sunvec} contains sun direction vectors with a Z component outside [-1, 1].")
+
+    try:
+        if _ALTAZ_KERNEL is None:
+            _ALTAZ_KERNEL = _compile_altaz_kernel()
+    except ImportError: # Numba is optional, fall back to a plain Python loop
+        return np.array([_altaz(x, y, z) for x, y, z in xyz]).reshape(-1, 2)
+
+    altaz = np.empty((xyz.shape[0], 2))
+    _ALTAZ_KERNEL(xyz, altaz)
+    return altaz
+
+
+
 def find_sun_properties(sun_description):
     """
     This function extracts the sun Radiance (RGB) and sun direction vector 
@@ -146,64 +243,43 @@ def find_sun_properties(sun_description):
         altitude (float): The altitude of the supplied sun description file
         azimuth (float): The azimtuth of the supplied sun description file
     """
-    # Extract sun Radiance (RGB)
-    with open(sun_description, 'r') as file:
-        lines = file.readlines()
+    # Extract sun Radiance (RGB) and sun direction vector (XYZ) in a single pass
+    rgb_lines = []
+    dir_lines = []
+    count_rgb = 0
+    count_dir = 0
 
-    result_lines = []
-    count = 0
-
-    for line in lines:
-        if line.startswith('void light solar') and count < 4:
-            result_lines.append(line)
-            count += 1
-        elif count > 0 and count < 4 and line.strip() != '':
-            result_lines.append(line)
-            count += 1
-        
-    if result_lines:
-        last_line_values = result_lines[-1].split()[1:]
+    with open(sun_description, 'r') as file:
+        for line in file:
+            if line.startswith('void light solar') and count_rgb < 4:
+                rgb_lines.append(line)
+                count_rgb += 1
+            elif count_rgb > 0 and count_rgb < 4 and line.strip() != '':
+                rgb_lines.append(line)
+                count_rgb += 1
+
+            if line.startswith('solar source sun') and count_dir < 4:
+                dir_lines.append(line)
+                count_dir += 1
+            elif count_dir > 0 and count_dir < 4 and line.strip() != '':
+                dir_lines.append(line)
+                count_dir += 1
+
+    if rgb_lines:
+        last_line_values = rgb_lines[-1].split()[1:]
         RGB_sun_radiance = last_line_values[-3:]
         
         print(f"Sun Radiance of the supplied sun description (RGB) found at: {RGB_sun_radiance}")    
         
-    # Extract sun direction vector (XYZ)
-    result_lines = []
-    count = 0
-
-    for line in lines:
-        if line.startswith('solar source sun') and count < 4:
-            result_lines.append(line)
-            count += 1
-        elif count > 0 and count < 4 and line.strip() != '':
-            result_lines.append(line)
-            count += 1
-            
-    if len(result_lines) > 0:
-        last_line_values = result_lines[-1].split()[1:]
+    if dir_lines:
+        last_line_values = dir_lines[-1].split()[1:]
         XYZ_sun_direction = last_line_values[:3]
         XYZ_sun_direction = [float(coord) for coord in XYZ_sun_direction]
         print(f"Sun direction vector (XYZ) of the supplied sun description found at: {XYZ_sun_direction}")
         
     # Calculate the solar altitude and azimuth
-    altitude = math.degrees(math.asin(XYZ_sun_direction[2]))
+    altitude, azimuth = xyz_to_altaz(*XYZ_sun_direction)
     print(f"Calculated solar altitude of the supplied sun description at {altitude}")
-
-    xDIVcos_altitude = XYZ_sun_direction[0] / (math.cos(math.radians(altitude)))
-
-    # Values higher than 1 are rounded to 1 to prevent a math error
-    if xDIVcos_altitude > 1:
-        xDIVcos_altitude = 1
-
-    azimuth_x = -math.degrees(math.asin(xDIVcos_altitude))    
-
-    if XYZ_sun_direction[0] < 0 and XYZ_sun_direction[1] < 0:
-        azimuth = azimuth_x
-    elif XYZ_sun_direction[1] >= 0:
-        azimuth = 180 - azimuth_x
-    elif XYZ_sun_direction[0] >= 0 and XYZ_sun_direction[1] < 0:
-        azimuth = 360 + azimuth_x
-
     print(f"Calculated solar azimuth of the supplied sun description at {azimuth}")    
     
     return RGB_sun_radiance, XYZ_sun_direction, altitude, azimuth
@@ -212,8 +288,8 @@ def find_sun_properties(sun_description):
 
 def set_irradiance(folderpath, RGB_original_radiance):
     """
-    This function copies the 001-sun_template.rad file to a file called 
-    001_sun.rad. 
+    This function fills in the 001-sun_template.rad file and writes it to a 
+    file called 001_sun.rad. 
     In the new file, the Radiance (RGB) is set equal to the Radiance of the 
     supplied sun description.
     
@@ -225,22 +301,22 @@ def set_irradiance(folderpath, RGB_original_radiance):
     Returns:
         Changes are made in 001-sun.rad
     """
-    shutil.copyfile(folderpath / "001-sun_template.rad", folderpath / "001-sun.rad")
-
-    with open(folderpath / "001-sun.rad", 'r') as file:
-        lines = file.readlines()
-    modified_lines = [line.replace("RADR", RGB_original_radiance[0]).replace("RADG", RGB_original_radiance[1]).replace("RADB", RGB_original_radiance[2]) for line in lines]
-
-    with open(folderpath / "001-sun.rad", 'w') as file:
-        file.writelines(modified_lines)
+    content = (folderpath / "001-sun_template.rad").read_text()
+    radiance_map = {"RADR": RGB_original_radiance[0], "RADG": RGB_original_radiance[1], "RADB": RGB_original_radiance[2]}
+    content = _RAD_RE.sub(lambda match: radiance_map[match.group(0)], content)
+    # An unchanged 001-sun.rad is left untouched, so the files generated from it can be reused
+    sun_rad = folderpath / "001-sun.rad"
+    if not sun_rad.is_file() or sun_rad.read_text() != content:
+        sun_rad.write_text(content)
     print(f"Created standard sun 001-sun.rad with RGB Radiance {RGB_original_radiance} (equal to the supplied sun description)")
 
 
 
 def gensunvecs(folderpath, pdim):
     """
-    Generates a list of sun vectors based on the number of pixels in a circle 
-    inscribed in the supplied square area. 
+    Generates a list of sun vectors based on the pixels that show the 
+    standard sun in a render of the supplied square area. The list is only 
+    regenerated when 001-sun.rad or x.vf has changed. 
     
     Args:
         folderpath (path): The path to the folder containing the template files  
@@ -251,24 +327,118 @@ def gensunvecs(folderpath, pdim):
         count (int): The number of direction vectors (mini-suns) generated
     """
 
-    res = f"-x {pdim} -y {pdim}"
+    # Paths used throughout this function
+    rad001 = folderpath / "001-sun.rad"
+    oct001 = folderpath / "001-sun.oct"
+    vf = folderpath / "x.vf"
     hdr = folderpath / f"{pdim}-sun.hdr"
-    
-    # render an image of the standard sun
-    os.system(f"oconv {folderpath}/001-sun.rad > {folderpath}/001-sun.oct")
-    os.system(f"rpict -vf {folderpath}/x.vf {res} -pj 0 -ps 1 -w {folderpath}/001-sun.oct > {hdr}")	
-
     sunvec = f"{pdim}-sun.vec"
-    # Generate a list of vectors based on a render of the standard sun
-    os.system(f"rlam  \"!vwrays {hdr} | rtrace -h -w -od {folderpath}/001-sun.oct\"  \"!pvalue -h -H -d -b  \"{hdr} | rcalc  -e \"$1=$1;$2=$2;$3=$3;cond=$4-1\" > {folderpath}/{sunvec}")
+    sunvec_path = folderpath / sunvec
+
+    # The list of vectors only has to be regenerated when the standard sun or view has changed, 
+    # an empty list is never reused
+    if (any(need_rebuild(source, sunvec_path) for source in [rad001, vf]) 
+            or sunvec_path.stat().st_size == 0):
+        # render an image of the standard sun
+        if need_rebuild(rad001, oct001):
+            run_to_file([["oconv", rad001]], oct001)
+        run_to_file([["rpict", "-vf", vf, "-x", pdim, "-y", pdim, "-pj", "0", "-ps", "1", "-w", oct001]], hdr)
+
+        # Generate a list of vectors based on a render of the standard sun
+        run_to_file([["rlam", f"!vwrays {hdr} | rtrace -h -w -od {oct001}", f"!pvalue -h -H -d -b {hdr}"],
+                     ["rcalc", "-e", "$1=$1;$2=$2;$3=$3;cond=$4-1"]], sunvec_path)
+        # rlam does not report failures of the commands it runs, so check the result
+        if sunvec_path.stat().st_size == 0:
+            sunvec_path.unlink()
+            raise ValueError(f"No direction vectors were generated in {sunvec}. Are RADIANCE and the templates set up correctly?")
+    else:
+        print(f"{sunvec} is up to date with 001-sun.rad and x.vf, skipped rendering the standard sun")
             
-    with open(folderpath / f"{sunvec}", 'r') as file:
-        count = sum(1 for _ in file)
+    # Count the vectors by counting newlines in 1 MB blocks, also for a reused list
+    count = 0
+    with open(sunvec_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            count += chunk.count(b'\n')
     print(f"Direction vectors for {count} mini suns, based on an image of {pdim}x{pdim} pixels written to file: {pdim}-sun.vec")
     return count
 
 
 
+def need_rebuild(src, dst):
+    """
+    Checks if a generated file is missing or not newer than the file it is 
+    built from. Equal modification times count as out of date, because 
+    filesystems with a coarse timestamp resolution cannot order them.
+    
+    Args:
+        src (path): The path to the source file
+        dst (path): The path to the generated file
+    Returns:
+        True if dst needs to be (re)built, False otherwise
+    """
+    return (not dst.exists()) or dst.stat().st_mtime <= src.stat().st_mtime
+
+
+
+def run_to_file(commands, dst, cwd=None):
+    """
+    Runs a pipeline of commands, without starting a shell, and writes the 
+    output of the last command to dst. The output is written to a temporary 
+    file first, which only replaces dst when every command succeeded, so a 
+    failed run never leaves a partial file that looks up to date.
+    
+    Args:
+        commands (list): The commands (argument lists) to pipe into each other
+        dst (path): The path to the file to write
+        cwd (path): The working directory of the commands
+    Returns:
+        None
+    """
+    tmp = dst.with_name(dst.name + ".tmp")
+    processes = []
+    try:
+        with open(tmp, "wb") as file:
+            stdin = None
+            for i, args in enumerate(commands):
+                stdout = file if i == len(commands) - 1 else subprocess.PIPE
+                process = subprocess.Popen([str(arg) for arg in args], stdin=stdin, stdout=stdout, cwd=cwd)
+                processes.append(process)
+                if stdin is not None:
+                    stdin.close() # Allow the previous command to receive a SIGPIPE if this one exits early
+                stdin = process.stdout
+            for process in processes:
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, process.args)
+        os.replace(tmp, dst)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if tmp.exists():
+            tmp.unlink()
+
+
+
+def calc_irradiance(folderpath, octree):
+    """
+    Calculates the (direct normal) irradiance for a surface orientated in the 
+    +ve x direction. rtrace is fed a single sample point, and the photopic 
+    weighting of its RGB output is done here instead of in rcalc.
+    
+    Args:
+        folderpath (path): The path to the folder containing the template files
+        octree (path): The path to the octree to be traced
+    Returns:
+        irradiance (float): The photopic irradiance of the supplied octree
+    """
+    output = subprocess.run(["rtrace", "-w", "-h", "-I", "-dc", "1", "-dt", "0", str(octree)],
+                            input=b"0 0 0 1 0 0\n", stdout=subprocess.PIPE, cwd=folderpath, check=True).stdout
+    r, g, b = map(float, output.split())
+    return r * 0.265 + g * 0.670 + b * 0.065
+
+
+
 def gensunrad(folderpath, sun_description, pdim, count, altitude, azimuth):
     """
     Creates a rad file (NNN-sun.rad) of a sun consisting of NNN mini suns, 
@@ -293,67 +463,92 @@ def gensunrad(folderpath, sun_description, pdim, count, altitude, azimuth):
         irradiance and location as the supplied sun description.
     """
     
-    # Check if the need list of sun vectors was created
+    # Paths used throughout this function
+    rad001 = folderpath / "001-sun.rad"
+    oct001 = folderpath / "001-sun.oct"
+    radNNN = folderpath / f"{pdim}-sun.rad"
+    octNNN = folderpath / f"{pdim}-sun.oct"
+    xformNNN = folderpath / f"{pdim}-sun_xform.rad"
     sunvec = f"{pdim}-sun.vec"
-    if os.path.isfile(folderpath / f"{sunvec}"):
+    sunvec_path = folderpath / sunvec
+    manysuns = folderpath / f"{sun_description.with_suffix('')}-{count}-suns_FNSTATIC.rad"
+
+    # Check if the need list of sun vectors was created
+    if os.path.isfile(sunvec_path):
         pass
     else:
         error_message = f"{sunvec} cannot be found. Has the file been generated?"
         raise FileNotFoundError(error_message)
 
     # Create NNN-sun.rad file and link to NNN-vec
-    shutil.copyfile(folderpath / "NNN-sun_template.rad", folderpath / f"{pdim}-sun.rad")
-
-    with open(folderpath / f"{pdim}-sun.rad", "r") as file:
-        content = file.read().replace("NNN", f"{pdim}")
-    with open(folderpath / f"{pdim}-sun.rad", "w") as file:
-        file.write(content)
+    # The content is kept in memory, so the Radiance can be substituted later without reading the file again
+    content = (folderpath / "NNN-sun_template.rad").read_text()
+    content = content.replace("NNN", f"{pdim}")
+    radNNN.write_text(content) # Needed on disk for oconv below
     print(f"Used {sunvec} and NNN-sun_template.rad to create descriptions of {count} suns: {pdim}-sun.rad")
 
     # Calculate (direct normal) irradiance for a surface orientated in the +ve x direction
     # Standard sun (001)
-    os.system(f"oconv {folderpath}/001-sun.rad > {folderpath}/001-sun.oct")
-    irrad_001 = float(subprocess.check_output(f"echo 0 0 0 1 0 0 | rtrace -w -h -I -dc 1 -dt 0 {folderpath}/001-sun.oct | rcalc -e \"$1=($1*0.265+$2*0.670+$3*0.065)\"", shell=True).decode('UTF-8'))
+    # 001-sun.oct has normally been built by gensunvecs already
+    if need_rebuild(rad001, oct001):
+        run_to_file([["oconv", rad001]], oct001)
+    irrad_001 = calc_irradiance(folderpath, oct001)
     print(f"Irradiance of standard sun (001-sun.rad) calculated at: {irrad_001} W⋅m²")
 
 
-    # Many suns (NNN)
-    os.system(f"cd {folderpath} & oconv -f {folderpath}/{pdim}-sun.rad > {folderpath}/{pdim}-sun.oct")
-    irrad_NNN = float(subprocess.check_output(f"cd {folderpath} & echo 0 0 0 1 0 0 | rtrace -w -h -I -dc 1 -dt 0 {folderpath}/{pdim}-sun.oct | rcalc -e \"$1=($1*0.265+$2*0.670+$3*0.065)\"", shell=True).decode('UTF-8'))
+    # Many suns (NNN), oconv is run from the template folder so the relative NNN-sun.vec reference resolves
+    # Always rebuilt: {pdim}-sun.rad has just been written, and oconv -f also freezes {pdim}-sun.vec and manysun.fmt
+    run_to_file([["oconv", "-f", radNNN]], octNNN, cwd=folderpath)
+    irrad_NNN = calc_irradiance(folderpath, octNNN)
     print(f"Irradiance of {count} suns ({pdim}-sun.rad) calculated at: {irrad_NNN} W⋅m²")
 
     # Calculate the Radiance of many suns needed to get equal irradiance
     rad_NNN = 10000 * irrad_001 / irrad_NNN # The Radiance in NNN-sun.rad was set arbitrarily at 1E4, hence 10000 in this line.
 
-    with open(folderpath / f"{pdim}-sun.rad", "r") as file:
-        content = file.read().replace("1E4", f"{rad_NNN}")
-    with open(folderpath / f"{pdim}-sun.rad", "w") as file:
-        file.write(content)
+    content = content.replace("1E4", f"{rad_NNN}")
+    radNNN.write_text(content)
     print(f"Set Radiance in {pdim}-sun.rad at {rad_NNN} to achieve equal irradiance")
 
     # Change Location of the many suns based on the solar altitude and azimuth
     azimuth_xform = azimuth + 90 # Correct for the standard sun being along the X-axis (1,0,0), while the azimuth is caluclated from the negative Y-axis (0,-1,0)
 
     # Apply Radiance xform
-    os.system(f"cd {folderpath} & xform -ry -{altitude} -rz -{azimuth_xform} {folderpath}/{pdim}-sun.rad > {folderpath}/{pdim}-sun_xform.rad")
+    run_to_file([["xform", "-ry", f"-{altitude}", "-rz", f"-{azimuth_xform}", radNNN]], xformNNN, cwd=folderpath)
     print(f"Changed the sun location to altitude: {altitude}, azimuth:{azimuth} degrees in {pdim}-sun_xform.rad")
    
-    # Copy the (original) supplied sun description, and replace the single sun with many suns
-    shutil.copyfile(sun_description, f"{sun_description.with_suffix('')}-{count}-suns_FNSTATIC.rad")
-    
-    with open(folderpath / f"{sun_description.with_suffix('')}-{count}-suns_FNSTATIC.rad", 'r') as file:
-        lines = file.readlines()
-    with open(folderpath / f"{pdim}-sun_xform.rad", 'r') as file:
-        new_lines = file.readlines()    
-    
-    start_index = lines.index('void light solar\n')
-    end_index = lines.index('solar source sun\n') + 4
-    lines[start_index:end_index] = new_lines
-
-    with open(folderpath / f"{sun_description.with_suffix('')}-{count}-suns_FNSTATIC.rad", 'w') as file:
+    # Copy the (original) supplied sun description, and replace the single sun with many suns in a single pass
+    with open(xformNNN, 'r') as file:
+        new_lines = file.readlines()
+
+    lines = []
+    replaced = False
+    in_single_sun = False
+    skip_left = 0 # Lines following 'solar source sun' that belong to the single sun
+    with open(sun_description, 'r') as file:
+        for line in file:
+            if in_single_sun:
+                if line == 'solar source sun\n':
+                    in_single_sun = False
+                    skip_left = 3
+            elif skip_left > 0:
+                skip_left -= 1
+            elif not replaced and line == 'void light solar\n':
+                # Only the first sun is replaced
+                lines.extend(new_lines)
+                replaced = True
+                in_single_sun = True
+            else:
+                lines.append(line)
+
+    if not replaced:
+        raise ValueError(f"'void light solar' not found in {sun_description}, the sun cannot be replaced.")
+    if in_single_sun or skip_left > 0:
+        raise ValueError(f"'solar source sun' not found or incomplete after 'void light solar' in {sun_description}, the sun cannot be replaced.")
+
+    with open(manysuns, 'w') as file:
         file.writelines(lines)
    
-    print(f"Created {sun_description.with_suffix('')}-{count}-suns_FNSTATIC.rad with {count} mini suns")
+    print(f"Created {manysuns} with {count} mini suns")
 
 
 